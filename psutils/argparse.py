@@ -6,7 +6,9 @@ Released under the GPL version 3, or (at your option) any later version.
 
 import importlib.metadata
 import argparse
+import functools
 import re
+import sys
 from typing import List, Tuple, Optional, Callable, NoReturn
 
 from .libpaper import get_paper_size
@@ -14,25 +16,47 @@ from .types import Rectangle, Range, PageSpec, Offset
 from .warnings import die
 
 
+# Compiled regular expressions for the parsers below; compiling once at module
+# level avoids a trip through the `re` pattern cache on every call.
+_RANGE_RE = re.compile(r"(_?\d+)?(?:(-)(_?\d+))?$")
+_SPEC_RE = re.compile(r"(?:([^:]+):)?(.*)")
+_PAGESPEC_RE = re.compile(
+    r"(-)?(\d+)([LRUHV]+)?(?:@([^()]+))?(?:\((-?[\d.a-z]+,-?[\d.a-z]+)\))?$",
+    re.IGNORECASE | re.ASCII,
+)
+
+# Rotation angle for the rotate letters in a page spec; H and V toggle flips.
+_MOD_ROTATE = {"l": 90, "r": -90, "u": 180}
+
+
 # Argument parsers
-def parserange(ranges_text: str) -> List[Range]:
+@functools.lru_cache(maxsize=256)
+def _parserange_cached(ranges_text: str) -> Tuple[Tuple[int, int, str], ...]:
     ranges = []
     for range_text in ranges_text.split(","):
-        range_ = Range(0, 0, range_text)
-        if range_.text != "_":
-            m = re.match(r"(_?\d+)?(?:(-)(_?\d+))?$", range_.text)
+        start, end = 0, 0
+        if range_text != "_":
+            m = _RANGE_RE.match(range_text)
             if not m:
-                die(f"`{range_.text}' is not a page range")
-            start = m[1] or "1"
-            end = (m[3] or "-1") if m[2] else m[1]
-            start = re.sub("^_", "-", start)
-            end = re.sub("^_", "-", end)
-            range_.start, range_.end = int(start), int(end)
-        ranges.append(range_)
-    return ranges
+                die(f"`{range_text}' is not a page range")
+            start_text = m[1] or "1"
+            end_text = (m[3] or "-1") if m[2] else m[1]
+            start_text = re.sub("^_", "-", start_text)
+            end_text = re.sub("^_", "-", end_text)
+            start, end = int(start_text), int(end_text)
+        ranges.append((start, end, range_text))
+    return tuple(ranges)
 
 
-def parsepaper(paper_size: str) -> Optional[Rectangle]:
+def parserange(ranges_text: str) -> List[Range]:
+    # Callers normalize Ranges in place, so rebuild fresh objects from the
+    # cached parse.
+    ranges = _parserange_cached(ranges_text)
+    return [Range(start, end, text) for start, end, text in ranges]
+
+
+@functools.lru_cache(maxsize=64)
+def _parsepaper_cached(paper_size: str) -> Tuple[float, float]:
     try:
         size = get_paper_size(paper_size)
         if size is None:
@@ -41,11 +65,16 @@ def parsepaper(paper_size: str) -> Optional[Rectangle]:
                 width = dimension(width_text)
                 height = dimension(height_text)
             size = Rectangle(width, height)
-        return size
+        return size.width, size.height
     except:  # pylint: disable=bare-except
         die(f"paper size '{paper_size}' unknown")
 
 
+def parsepaper(paper_size: str) -> Optional[Rectangle]:
+    width, height = _parsepaper_cached(paper_size)
+    return Rectangle(width, height)
+
+
 units = {
     "": 1,
     "pt": 1,
@@ -55,6 +84,7 @@ units = {
 }
 
 
+@functools.lru_cache(maxsize=256)
 def dimension(s: str) -> float:
     m = re.match(r"(.+?)(|pt|in|cm|mm)$", s)
     if not m:
@@ -100,31 +130,53 @@ def specerror() -> NoReturn:
     )
 
 
-def parsespecs(
-    s: str,
-    paper_context: PaperContext,
-    err_function: Callable[[], NoReturn] = specerror,
-) -> Tuple[List[List[PageSpec]], int, bool]:
+class _SpecsError(ValueError):
+    pass
+
+
+# Split on commas but not inside parentheses. A single pass over the string
+# beats the equivalent lookahead regex, which rescans from every comma.
+def _split_specs(specs_text: str) -> List[str]:
+    parts = []
+    depth = 0
+    start = 0
+    for i, c in enumerate(specs_text):
+        if c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "," and depth == 0:
+            parts.append(specs_text[start:i])
+            start = i + 1
+    parts.append(specs_text[start:])
+    return parts
+
+
+# Frozen form of a PageSpec, safe to hold in the cache below.
+_FrozenSpec = Tuple[bool, int, int, bool, bool, float, Offset]
+
+
+@functools.lru_cache(maxsize=64)
+def _parsespecs_cached(
+    s: str, paper_width: Optional[float], paper_height: Optional[float]
+) -> Tuple[Tuple[Tuple[_FrozenSpec, ...], ...], int, bool]:
+    paper = None
+    if paper_width is not None and paper_height is not None:
+        paper = Rectangle(paper_width, paper_height)
+    paper_context = PaperContext(paper)
     flipping = False
-    m = re.match(r"(?:([^:]+):)?(.*)", s)
+    m = _SPEC_RE.match(s)
     if not m:
-        err_function()
+        raise _SpecsError()
     modulo, specs_text = int(m[1] or "1"), m[2]
-    # Split on commas but not inside parentheses.
-    pages_text = re.split(r",(?![^()]*\))", specs_text)
+    pages_text = _split_specs(specs_text)
     pages = []
-    angle = {"l": 90, "r": -90, "u": 180}
     for page in pages_text:
         specs = []
-        specs_text = page.split("+")
-        for spec_text in specs_text:
-            m = re.match(
-                r"(-)?(\d+)([LRUHV]+)?(?:@([^()]+))?(?:\((-?[\d.a-z]+,-?[\d.a-z]+)\))?$",
-                spec_text,
-                re.IGNORECASE | re.ASCII,
-            )
+        for spec_text in page.split("+"):
+            m = _PAGESPEC_RE.match(spec_text)
             if not m:
-                err_function()
+                raise _SpecsError()
             spec = PageSpec()
             if m[1] is not None:
                 spec.reversed = True
@@ -139,14 +191,15 @@ def parsespecs(
                     paper_context.dimension(yoff_str),
                 )
             if spec.pageno >= modulo:
-                err_function()
+                raise _SpecsError()
             if m[3] is not None:
-                for mod in m[3]:
-                    if re.match(r"[LRU]", mod, re.IGNORECASE):
-                        spec.rotate += angle[mod.lower()]
-                    elif re.match(r"H", mod, re.IGNORECASE):
+                for mod in m[3].lower():
+                    angle = _MOD_ROTATE.get(mod)
+                    if angle is not None:
+                        spec.rotate += angle
+                    elif mod == "h":
                         spec.hflip = not spec.hflip
-                    elif re.match(r"V", mod, re.IGNORECASE):
+                    else:
                         spec.vflip = not spec.vflip
             # Normalize rotation and flips
             if spec.hflip and spec.vflip:
@@ -155,9 +208,55 @@ def parsespecs(
             spec.rotate %= 360
             if spec.hflip or spec.vflip:
                 flipping = True
+            specs.append(
+                (
+                    spec.reversed,
+                    spec.pageno,
+                    spec.rotate,
+                    spec.hflip,
+                    spec.vflip,
+                    spec.scale,
+                    spec.off,
+                )
+            )
+        pages.append(tuple(specs))
+    return tuple(pages), modulo, flipping
+
+
+def parsespecs(
+    s: str,
+    paper_context: PaperContext,
+    err_function: Callable[[], NoReturn] = specerror,
+) -> Tuple[List[List[PageSpec]], int, bool]:
+    # Only successful parses are cached, so err_function cannot affect a
+    # cached result; PageSpecs are mutable, so thaw fresh ones on each call.
+    paper = paper_context.default_paper
+    try:
+        pages, modulo, flipping = _parsespecs_cached(
+            s,
+            paper.width if paper is not None else None,
+            paper.height if paper is not None else None,
+        )
+    except _SpecsError:
+        err_function()
+    result = []
+    for page in pages:
+        specs = []
+        for frozen in page:
+            spec = PageSpec()
+            (
+                spec.reversed,
+                spec.pageno,
+                spec.rotate,
+                spec.hflip,
+                spec.vflip,
+                spec.scale,
+                spec.off,
+            ) = frozen
+            spec.transform = spec.has_transform()
             specs.append(spec)
-        pages.append(specs)
-    return pages, modulo, flipping
+        result.append(specs)
+    return result, modulo, flipping
 
 
 # Help output
@@ -184,10 +283,9 @@ class HelpFormatter(argparse.RawTextHelpFormatter):
         return ", ".join(parts)
 
 
-VERSION = importlib.metadata.version("pspdfutils")
-
-VERSION_BANNER = f"""\
-%(prog)s {VERSION}
+def _version_banner() -> str:
+    return f"""\
+%(prog)s {importlib.metadata.version("pspdfutils")}
 Copyright (c) Reuben Thomas 2023.
 Licence GPLv3+: GNU GPL version 3 or later <https://gnu.org/licenses/gpl.html>.
 This is free software: you are free to change and redistribute it.
@@ -195,12 +293,53 @@ There is NO WARRANTY, to the extent permitted by law.
 """
 
 
+# Resolve package metadata lazily (PEP 562): looking it up scans the
+# installed distributions, which is pure startup overhead for the common
+# runs that never print a version.
+def __getattr__(name: str) -> str:
+    if name == "VERSION":
+        return importlib.metadata.version("pspdfutils")
+    if name == "VERSION_BANNER":
+        return _version_banner()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class VersionAction(argparse.Action):
+    # Like action="version", but defers the metadata lookup until the
+    # option is actually given on the command line.
+    def __init__(
+        self,
+        option_strings: List[str],
+        dest: str = argparse.SUPPRESS,
+        default: str = argparse.SUPPRESS,
+        help: str = "show program's version number and exit",  # pylint: disable=redefined-builtin
+    ) -> None:
+        super().__init__(
+            option_strings=option_strings,
+            dest=dest,
+            default=default,
+            nargs=0,
+            help=help,
+        )
+
+    def __call__(
+        self,
+        parser: argparse.ArgumentParser,
+        namespace: argparse.Namespace,
+        values: object,
+        option_string: Optional[str] = None,
+    ) -> None:
+        formatter = parser._get_formatter()
+        formatter.add_text(_version_banner())
+        parser._print_message(formatter.format_help(), sys.stdout)
+        parser.exit()
+
+
 def add_version_argument(parser: argparse.ArgumentParser) -> None:
     parser.add_argument(
         "-v",
         "--version",
-        action="version",
-        version=VERSION_BANNER,
+        action=VersionAction,
     )
 
 
@@ -1,4 +1,5 @@
 import argparse
+import functools
 import sys
 import warnings
 from typing import List, Optional, Tuple, NoReturn
@@ -23,6 +24,10 @@ DEFAULT_SPECS = "0"
 
 
 # Command-line parsing helper functions
+# Cached: building the parser does a dozen add_argument calls and formats
+# the help epilog, which in-process callers (tests, wrappers) would
+# otherwise repeat on every invocation.
+@functools.cache
 def get_parser() -> Tuple[argparse.ArgumentParser, PaperContext]:
     # Command-line arguments
     parser = argparse.ArgumentParser(
@@ -37,7 +42,6 @@ SPECS is a list of page specifications [default is "{DEFAULT_SPECS}", which sele
 each page in its normal order].
 """,
     )
-    warnings.showwarning = simple_warning(parser.prog)
     paper_context = PaperContext()
 
     # Command-line parser
@@ -98,6 +102,7 @@ def spec_exception() -> NoReturn:
 # pylint: disable=dangerous-default-value
 def pstops(argv: List[str] = sys.argv[1:]) -> None:
     parser, paper_context = get_parser()
+    warnings.showwarning = simple_warning(parser.prog)
     args = parser.parse_intermixed_args(argv)
 
     # Get specs if we don't have them yet
@@ -36,14 +36,15 @@ def setup_input_and_output(
     # Slurp infile into a seekable BytesIO
     infile = io.BytesIO(data + infile.read())
 
-    # Set up output
+    # Set up output, with a large write buffer so page-sized writes
+    # coalesce into few system calls
     if outfile_name is not None:
         try:
-            outfile = open(outfile_name, "wb")
+            outfile = open(outfile_name, "wb", buffering=1 << 20)
         except IOError:
             die(f"cannot open output file {outfile_name}")
     else:
-        outfile = os.fdopen(sys.stdout.fileno(), "wb", closefd=False)
+        outfile = os.fdopen(sys.stdout.fileno(), "wb", 1 << 20, closefd=False)
 
     # Context manager
     try:
@@ -5,11 +5,12 @@ Released under the GPL version 3, or (at your option) any later version.
 """
 
 import io
+import os
 import sys
-import shutil
 from abc import ABC, abstractmethod
+from collections import deque
 from contextlib import contextmanager
-from typing import List, Optional, Union, Iterator, IO
+from typing import Deque, Dict, List, Optional, Union, Iterator, IO
 from warnings import warn
 
 from pypdf import PdfWriter, Transformation
@@ -22,10 +23,51 @@ from .types import Rectangle, Range, Offset, PageSpec, PageList
 from .warnings import die
 
 
-def page_index_to_page_number(
-    spec: PageSpec, maxpage: int, modulo: int, pagebase: int
-) -> int:
-    return (maxpage - pagebase - modulo if spec.reversed else pagebase) + spec.pageno
+_COPY_BUFSIZE = 256 * 1024
+
+
+# Copy `n` bytes from the current position of `infile` to `outfile` without
+# building the whole run of bytes as one Python object. When both files are
+# backed by real file descriptors the copy is done in-kernel with
+# os.sendfile; otherwise fall back to bounded-size chunks.
+def _fastcopy(infile: IO[bytes], outfile: IO[bytes], n: int) -> None:
+    if n <= 0:
+        return
+    # Write below any text-mode wrapper: the transfer must stay
+    # byte-for-byte, with no re-encode on write.
+    if hasattr(outfile, "buffer"):
+        outfile.flush()
+        outfile = outfile.buffer
+    if hasattr(os, "sendfile"):
+        try:
+            in_fd, out_fd = infile.fileno(), outfile.fileno()
+        except (OSError, io.UnsupportedOperation):
+            in_fd = out_fd = -1  # not backed by file descriptors; copy in chunks
+        if in_fd >= 0:
+            offset = infile.tell()
+            outfile.flush()  # keep fd-level writes ordered after buffered ones
+            sent = 0
+            try:
+                while sent < n:
+                    count = os.sendfile(out_fd, in_fd, offset + sent, n - sent)
+                    if count == 0:
+                        break
+                    sent += count
+            except OSError:
+                # Fall back only if nothing was copied; once bytes have been
+                # sent, retrying from the start would duplicate them.
+                if sent > 0:
+                    infile.seek(offset + sent)
+                    raise
+            else:
+                infile.seek(offset + sent)
+                return
+    while n > 0:
+        data = infile.read(min(n, _COPY_BUFSIZE))
+        if not data:
+            break
+        outfile.write(data)
+        n -= len(data)
 
 
 class DocumentTransform(ABC):
@@ -51,9 +93,8 @@ class DocumentTransform(ABC):
         page_list: PageList,
         outputpage: int,
         page_specs: List[PageSpec],
-        maxpage: int,
-        modulo: int,
-        pagebase: int,
+        page_numbers: List[int],
+        real_pages: List[int],
     ) -> None:
         pass
 
@@ -105,23 +146,28 @@ class DocumentTransform(ABC):
 
             # Rearrange pages
             self.write_header(maxpage, modulo)
+            specs = self.specs
+            real_page = page_list.real_page
             pagebase = 0
             while pagebase < maxpage:
-                for page in self.specs:
-                    # Construct the page label from the input page numbers
-                    pagelabels = []
-                    for spec in page:
-                        n = page_list.real_page(
-                            page_index_to_page_number(spec, maxpage, modulo, pagebase)
-                        )
-                        pagelabels.append(str(n + 1) if n >= 0 else "*")
-                    pagelabel = ",".join(pagelabels)
+                reversed_base = maxpage - pagebase - modulo
+                for page in specs:
+                    # Compute each spec's input page number and real page
+                    # once; they are shared by the label and write_page.
+                    page_numbers = [
+                        (reversed_base if spec.reversed else pagebase) + spec.pageno
+                        for spec in page
+                    ]
+                    real_pages = [real_page(n) for n in page_numbers]
+                    pagelabel = ",".join(
+                        str(n + 1) if n >= 0 else "*" for n in real_pages
+                    )
                     outputpage += 1
                     self.write_page_comment(pagelabel, outputpage)
                     if verbose:
                         sys.stderr.write(f"[{pagelabel}] ")
                     self.write_page(
-                        page_list, outputpage, page, maxpage, modulo, pagebase
+                        page_list, outputpage, page, page_numbers, real_pages
                     )
 
                 pagebase += modulo
@@ -188,9 +234,14 @@ end"""
         self.draw = draw
         self.specs = specs
         self.in_size_guessed = in_size_guessed
+        # Pending text fragments, encoded and written in one go by flush_text
+        self._parts: List[str] = []
+        # Transform prologue text per spec, formatted once and reused for
+        # every output page (keyed by spec identity; specs outlive us)
+        self._transform_cache: Dict[int, str] = {}
 
         self.use_procset = any(
-            len(page) > 1 or page[0].has_transform() for page in specs
+            len(page) > 1 or page[0].transform for page in specs
         )
 
         self.size = size
@@ -206,7 +257,9 @@ end"""
 
     def write_header(self, maxpage: int, modulo: int) -> None:
         # FIXME: doesn't cope properly with loaded definitions
-        ignorelist = [] if self.size is None else self.reader.sizeheaders
+        ignorelist: Deque[int] = (
+            deque() if self.size is None else deque(self.reader.sizeheaders)
+        )
         self.reader.infile.seek(0)
         if self.reader.pagescmt:
             self.fcopy(self.reader.pagescmt, ignorelist)
@@ -217,14 +270,13 @@ end"""
             if self.size is not None:
                 if self.in_size_guessed:
                     warn(f"required input paper size was guessed as {self.in_size}")
+                width, height = int(self.size.width), int(self.size.height)
                 self.write(
-                    f"%%DocumentMedia: plain {int(self.size.width)} {int(self.size.height)} 0 () ()"
-                )
-                self.write(
-                    f"%%BoundingBox: 0 0 {int(self.size.width)} {int(self.size.height)}"
+                    f"%%DocumentMedia: plain {width} {height} 0 () ()\n"
+                    f"%%BoundingBox: 0 0 {width} {height}"
                 )
             pagesperspec = len(self.specs)
-            self.write(f"%%Pages: {int(maxpage / modulo) * pagesperspec} 0")
+            self.write(f"%%Pages: {(maxpage // modulo) * pagesperspec} 0")
         self.fcopy(self.reader.headerpos, ignorelist)
         if self.use_procset:
             self.write(f"%%BeginProcSet: PStoPS 1 15\n{self.procset}")
@@ -233,9 +285,9 @@ end"""
         # Write prologue to end of setup section, skipping our procset if present
         # and we're outputting it (this allows us to upgrade our procset)
         if self.reader.procset_pos and self.use_procset:
-            self.fcopy(self.reader.procset_pos.start, [])
+            self.fcopy(self.reader.procset_pos.start)
             self.reader.infile.seek(self.reader.procset_pos.stop)
-        self.fcopy(self.reader.endsetup, [])
+        self.fcopy(self.reader.endsetup)
 
         # Save transformation from original to current matrix
         if not self.reader.procset_pos and self.use_procset:
@@ -246,124 +298,152 @@ end"""
             )
 
         # Write from end of setup to start of pages
-        self.fcopy(self.reader.pageptr[0], [])
+        self.fcopy(self.reader.pageptr[0])
 
     def write(self, text: str) -> None:
-        self.outfile.write((text + "\n").encode("utf-8"))
+        # Buffer the text; each print-sized write would otherwise pay for a
+        # separate encode and file write. flush_text emits the batch.
+        self._parts.append(text)
+        self._parts.append("\n")
+
+    def flush_text(self) -> None:
+        # latin-1 is a 1:1 byte mapping: identical to UTF-8 for the ASCII
+        # PostScript we generate, and it round-trips copied setup lines
+        # byte-for-byte whatever their encoding
+        if self._parts:
+            self.outfile.write("".join(self._parts).encode("latin-1"))
+            self._parts.clear()
 
     def write_page_comment(self, pagelabel: str, outputpage: int) -> None:
         self.write(f"%%Page: ({pagelabel}) {outputpage}")
 
+    # Return the transform prologue for `spec`. It depends only on the spec,
+    # the input size and the draw width, so it is formatted on first use and
+    # cached for the remaining output pages.
+    def transform_text(self, spec: PageSpec) -> str:
+        text = self._transform_cache.get(id(spec))
+        if text is None:
+            parts = ["PStoPSmatrix setmatrix"]
+            if spec.off != Offset(0.0, 0.0):
+                parts.append(f"{spec.off.x:f} {spec.off.y:f} translate")
+            if spec.rotate != 0:
+                parts.append(f"{spec.rotate % 360} rotate")
+            if spec.hflip == 1:
+                assert self.in_size is not None
+                parts.append(
+                    f"[ -1 0 0 1 {self.in_size.width * spec.scale:g} 0 ] concat"
+                )
+            if spec.vflip == 1:
+                assert self.in_size is not None
+                parts.append(
+                    f"[ 1 0 0 -1 0 {self.in_size.height * spec.scale:g} ] concat"
+                )
+            if spec.scale != 1.0:
+                parts.append(f"{spec.scale:f} dup scale")
+            parts.append("userdict/PStoPSmatrix matrix currentmatrix put")
+            if self.in_size is not None:
+                w, h = self.in_size.width, self.in_size.height
+                parts.append(
+                    f"""userdict/PStoPSclip{{0 0 moveto
+ {w:f} 0 rlineto 0 {h:f} rlineto {-w:f} 0 rlineto
+ closepath}}put initclip"""
+                )
+                if self.draw > 0:
+                    parts.append(
+                        f"gsave clippath 0 setgray {self.draw} setlinewidth stroke grestore"
+                    )
+            text = "\n".join(parts)
+            self._transform_cache[id(spec)] = text
+        return text
+
     def write_page(
         self,
         page_list: PageList,
         outputpage: int,
         page_specs: List[PageSpec],
-        maxpage: int,
-        modulo: int,
-        pagebase: int,
+        page_numbers: List[int],
+        real_pages: List[int],
     ) -> None:
-        spec_page_number = 0
-        for spec in page_specs:
-            page_number = page_index_to_page_number(spec, maxpage, modulo, pagebase)
-            real_page = page_list.real_page(page_number)
-            if page_number < page_list.num_pages() and 0 <= real_page < self.pages():
+        reader = self.reader
+        infile = reader.infile
+        pageptr = reader.pageptr
+        use_procset = self.use_procset
+        procset_pos = reader.procset_pos
+        num_list_pages = page_list.num_pages()
+        num_doc_pages = self.pages()
+        last_spec_number = len(page_specs) - 1
+        for spec_page_number, spec in enumerate(page_specs):
+            page_number = page_numbers[spec_page_number]
+            real_page = real_pages[spec_page_number]
+            if page_number < num_list_pages and 0 <= real_page < num_doc_pages:
                 # Seek the page
                 pagenum = real_page
-                self.reader.infile.seek(self.reader.pageptr[pagenum])
+                infile.seek(pageptr[pagenum])
                 try:
-                    line = self.reader.infile.readline()
-                    keyword, _ = self.reader.comment(line)
+                    line = infile.readline()
+                    keyword, _ = reader.comment(line)
                     assert keyword == b"Page"
                 except IOError:
                     die(f"I/O error seeking page {pagenum}", 2)
-            if self.use_procset:
+            if use_procset:
                 self.write("userdict/PStoPSsaved save put")
-            if spec.has_transform():
-                self.write("PStoPSmatrix setmatrix")
-                if spec.off != Offset(0.0, 0.0):
-                    self.write(f"{spec.off.x:f} {spec.off.y:f} translate")
-                if spec.rotate != 0:
-                    self.write(f"{spec.rotate % 360} rotate")
-                if spec.hflip == 1:
-                    assert self.in_size is not None
-                    self.write(
-                        f"[ -1 0 0 1 {self.in_size.width * spec.scale:g} 0 ] concat"
-                    )
-                if spec.vflip == 1:
-                    assert self.in_size is not None
-                    self.write(
-                        f"[ 1 0 0 -1 0 {self.in_size.height * spec.scale:g} ] concat"
-                    )
-                if spec.scale != 1.0:
-                    self.write(f"{spec.scale:f} dup scale")
-                self.write("userdict/PStoPSmatrix matrix currentmatrix put")
-                if self.in_size is not None:
-                    w, h = self.in_size.width, self.in_size.height
-                    self.write(
-                        f"""userdict/PStoPSclip{{0 0 moveto
- {w:f} 0 rlineto 0 {h:f} rlineto {-w:f} 0 rlineto
- closepath}}put initclip"""
-                    )
-                    if self.draw > 0:
-                        self.write(
-                            f"gsave clippath 0 setgray {self.draw} setlinewidth stroke grestore"
-                        )
-            if spec_page_number < len(page_specs) - 1:
+            if spec.transform:
+                self.write(self.transform_text(spec))
+            if spec_page_number < last_spec_number:
                 self.write("/PStoPSenablepage false def")
             if (
-                self.reader.procset_pos
-                and page_number < page_list.num_pages()
-                and real_page < self.pages()
+                procset_pos
+                and page_number < num_list_pages
+                and real_page < num_doc_pages
             ):
                 # Search for page setup
                 while True:
                     try:
-                        line = self.reader.infile.readline()
+                        line = infile.readline()
                     except IOError:
                         die(f"I/O error reading page setup {outputpage}", 2)
                     if line.startswith(b"PStoPSxform"):
                         break
                     try:
-                        self.write(line.decode())
+                        self.write(line.decode("latin-1"))
                     except IOError:
                         die(f"I/O error writing page setup {outputpage}", 2)
-            if not self.reader.procset_pos and self.use_procset:
+            if not procset_pos and use_procset:
                 self.write("PStoPSxform concat")
-            if page_number < page_list.num_pages() and 0 <= real_page < self.pages():
+            if page_number < num_list_pages and 0 <= real_page < num_doc_pages:
                 # Write the body of a page
-                self.fcopy(self.reader.pageptr[real_page + 1], [])
+                self.fcopy(pageptr[real_page + 1])
             else:
                 self.write("showpage")
-            if self.use_procset:
+            if use_procset:
                 self.write("PStoPSsaved restore")
-            spec_page_number += 1
 
     def finalize(self) -> None:
         # Write trailer
-        self.reader.infile.seek(self.reader.pageptr[self.pages()])
-        shutil.copyfileobj(self.reader.infile, self.outfile)  # type: ignore
+        self.flush_text()
+        infile = self.reader.infile
+        end = infile.seek(0, os.SEEK_END)
+        start = infile.seek(self.reader.pageptr[self.pages()])
+        _fastcopy(infile, self.outfile, end - start)
         self.outfile.flush()
 
     # Copy input file from current position up to new position to output file,
     # ignoring the lines starting at something ignorelist points to.
     # Updates ignorelist.
-    def fcopy(self, upto: int, ignorelist: List[int]) -> None:
-        here = self.reader.infile.tell()
-        while len(ignorelist) > 0 and ignorelist[0] < upto:
-            while len(ignorelist) > 0 and ignorelist[0] < here:
-                ignorelist.pop(0)
-            if len(ignorelist) > 0:
-                self.fcopy(ignorelist[0], [])
-            try:
-                self.reader.infile.readline()
-            except IOError:
-                die("I/O error", 2)
-            ignorelist.pop(0)
-            here = self.reader.infile.tell()
-
+    def fcopy(self, upto: int, ignorelist: Optional[Deque[int]] = None) -> None:
+        self.flush_text()
+        infile = self.reader.infile
+        here = infile.tell()
         try:
-            self.outfile.write(self.reader.infile.read(upto - here))
+            if ignorelist:
+                while ignorelist and ignorelist[0] < upto:
+                    pos = ignorelist.popleft()
+                    if pos < here:
+                        continue
+                    _fastcopy(infile, self.outfile, pos - here)
+                    infile.readline()
+                    here = infile.tell()
+            _fastcopy(infile, self.outfile, upto - here)
         except IOError:
             die("I/O error", 2)
 
@@ -407,18 +487,15 @@ class PdfTransform(DocumentTransform):
         page_list: PageList,
         outputpage: int,
         page_specs: List[PageSpec],
-        maxpage: int,
-        modulo: int,
-        pagebase: int,
+        page_numbers: List[int],
+        real_pages: List[int],
     ) -> None:
         assert self.in_size
-        page_number = page_index_to_page_number(
-            page_specs[0], maxpage, modulo, pagebase
-        )
-        real_page = page_list.real_page(page_number)
+        page_number = page_numbers[0]
+        real_page = real_pages[0]
         if (  # pylint: disable=too-many-boolean-expressions
             len(page_specs) == 1
-            and not page_specs[0].has_transform()
+            and not page_specs[0].transform
             and page_number < page_list.num_pages()
             and 0 <= real_page < len(self.reader.pages)
             and self.draw == 0
@@ -435,9 +512,9 @@ class PdfTransform(DocumentTransform):
         else:
             # Add a blank page of the correct size to the end of the document
             outpdf_page = self.writer.add_blank_page(self.size.width, self.size.height)
-            for spec in page_specs:
-                page_number = page_index_to_page_number(spec, maxpage, modulo, pagebase)
-                real_page = page_list.real_page(page_number)
+            for spec, page_number, real_page in zip(
+                page_specs, page_numbers, real_pages
+            ):
                 if page_number < page_list.num_pages() and 0 <= real_page < len(
                     self.reader.pages
                 ):
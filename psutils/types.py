@@ -19,34 +19,55 @@ class Rectangle:
         return f"{self.width:n}x{self.height:n} pt"
 
 
-@dataclass
-class Range:
-    start: int
-    end: int
-    text: str
+class Range:  # pylint: disable=too-few-public-methods
+    # Slots rather than a dataclass: these are created in bulk when parsing
+    # page ranges, and slots avoid a per-instance __dict__.
+    __slots__ = ("start", "end", "text")
+
+    def __init__(self, start: int, end: int, text: str) -> None:
+        self.start = start
+        self.end = end
+        self.text = text
 
 
 Offset = NamedTuple("Offset", [("x", float), ("y", float)])
 
 
-@dataclass
-class PageSpec:
-    reversed: bool = False
-    pageno: int = 0
-    rotate: int = 0
-    hflip: bool = False
-    vflip: bool = False
-    scale: float = 1.0
-    off: Offset = Offset(0.0, 0.0)
+class PageSpec:  # pylint: disable=too-few-public-methods,too-many-instance-attributes
+    # Slots: attribute access on page specs is in the inner loop of page
+    # emission, and a slot load is cheaper than a __dict__ probe.
+    __slots__ = (
+        "reversed",
+        "pageno",
+        "rotate",
+        "hflip",
+        "vflip",
+        "scale",
+        "off",
+        "transform",
+    )
+
+    def __init__(self) -> None:
+        self.reversed: bool = False
+        self.pageno: int = 0
+        self.rotate: int = 0
+        self.hflip: bool = False
+        self.vflip: bool = False
+        self.scale: float = 1.0
+        self.off: Offset = Offset(0.0, 0.0)
+        # has_transform(), precomputed once the fields are final; read this
+        # rather than re-deriving it per output page
+        self.transform: bool = False
 
     def has_transform(self) -> bool:
-        return (
-            self.rotate != 0
-            or self.hflip
-            or self.vflip
-            or self.scale != 1.0
-            or self.off != Offset(0.0, 0.0)
+        rotate, hflip, vflip, scale, off = (
+            self.rotate,
+            self.hflip,
+            self.vflip,
+            self.scale,
+            self.off,
         )
+        return rotate != 0 or hflip or vflip or scale != 1.0 or off != Offset(0.0, 0.0)
 
 
 class PageList:
@@ -61,24 +82,23 @@ class PageList:
         self.pages: List[int] = []
         for range_ in pagerange:
             inc = -1 if range_.end < range_.start else 1
-            currentpg = range_.start
-            while range_.end - currentpg != -inc:
-                if currentpg > total_pages:
-                    die(f"page range {range_.text} is invalid", 2)
-                if not (odd and (not even) and currentpg % 2 == 0) and not (
-                    even and not odd and currentpg % 2 == 1
-                ):
-                    self.pages.append(currentpg - 1)
-                currentpg += inc
+            if max(range_.start, range_.end) > total_pages:
+                die(f"page range {range_.text} is invalid", 2)
+            range_pages = range(range_.start, range_.end + inc, inc)
+            if odd and not even:
+                self.pages.extend(p - 1 for p in range_pages if p % 2 == 1)
+            elif even and not odd:
+                self.pages.extend(p - 1 for p in range_pages if p % 2 == 0)
+            else:
+                self.pages.extend(p - 1 for p in range_pages)
         if reverse:
             self.pages.reverse()
 
     # Returns -1 for an inserted blank page (page number '_')
     def real_page(self, pagenum: int) -> int:
-        try:
-            return self.pages[pagenum]
-        except IndexError:
-            return 0
+        # Out-of-range lookups are routine (padding pages at the end of the
+        # document), so test the bound rather than catching IndexError.
+        return self.pages[pagenum] if pagenum < len(self.pages) else 0
 
     def num_pages(self) -> int:
         return len(self.pages)